@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import date
+from typing import Optional, List, Any, Dict
+from datetime import date, datetime
 
 # Author schemas
 class AuthorBase(BaseModel):
@@ -211,4 +211,70 @@ class ThesisResponseWithRelations(ThesisResponse):
     topics: List[SubjectTopicResponse] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Change feed schemas
+class ChangeResponse(BaseModel):
+    seq: int
+    entity: str
+    entity_id: int
+    operation: str
+    data: Optional[Dict[str, Any]] = None
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChangeFeedResponse(BaseModel):
+    changes: List[ChangeResponse] = []
+    last_seq: int
+
+# Bootstrap schemas
+class BootstrapResponse(BaseModel):
+    version: int
+    last_seq: int
+    universities: Optional[List[UniversityResponse]] = None
+    institutes: Optional[List[InstituteResponse]] = None
+    languages: Optional[List[LanguageResponse]] = None
+    keywords: Optional[List[KeywordResponse]] = None
+    subject_topics: Optional[List[SubjectTopicResponse]] = None
+    authors: Optional[List[AuthorResponse]] = None
+    supervisors: Optional[List[SupervisorResponse]] = None
+    theses: Optional[List[ThesisResponse]] = None
+
+# Deduplication schemas
+class DuplicateMember(BaseModel):
+    id: int
+    name: str
+
+class DuplicateCluster(BaseModel):
+    canonical_id: int
+    members: List[DuplicateMember]
+
+    class Config:
+        from_attributes = True
+
+class DedupStats(BaseModel):
+    rows_scanned: int
+    rows_without_name: int
+    blocks: int
+    windowed_blocks: int
+    windowed_block_rows: int
+    clusters: int
+
+class DuplicateClusterPage(BaseModel):
+    run_id: int
+    threshold: float
+    created_at: datetime
+    stats: DedupStats
+    total: int
+    clusters: List[DuplicateCluster] = []
+
+class MergeRequest(BaseModel):
+    target_id: int
+    source_ids: List[int]
+
+class MergeResponse(BaseModel):
+    target_id: int
+    merged_ids: List[int]
+    references_rewritten: int
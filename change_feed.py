@@ -0,0 +1,67 @@
+from sqlalchemy import inspect, text
+from fastapi.encoders import jsonable_encoder
+from models import Author, Thesis, University, Institute, Language, Keyword, SubjectTopic, Supervisor, ChangeLog
+
+# Entities whose writes are published on the change feed
+TRACKED_ENTITIES = {
+    University: "university",
+    Institute: "institute",
+    Language: "language",
+    Keyword: "keyword",
+    SubjectTopic: "subject_topic",
+    Author: "author",
+    Supervisor: "supervisor",
+    Thesis: "thesis",
+}
+
+def _entity_state(obj):
+    mapper = inspect(obj).mapper
+    return jsonable_encoder({attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+def _entity_id(obj):
+    return inspect(obj).mapper.primary_key_from_instance(obj)[0]
+
+def record_changes(session, flush_context):
+    # Runs inside the flush, so the log rows commit or roll back with the data they describe.
+    rows = []
+    for operation, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            entity = TRACKED_ENTITIES.get(type(obj))
+            if entity is None:
+                continue
+            if operation == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({
+                "entity": entity,
+                "entity_id": _entity_id(obj),
+                "operation": operation,
+                "data": None if operation == "delete" else _entity_state(obj),
+            })
+    write_change_rows(session, rows)
+
+def record_bulk_changes(session, model, operation, objects=(), ids=()):
+    # For Core-level bulk statements, which the after_flush hook never sees
+    entity = TRACKED_ENTITIES[model]
+    rows = [{"entity": entity, "entity_id": _entity_id(obj), "operation": operation, "data": _entity_state(obj)} for obj in objects]
+    rows += [{"entity": entity, "entity_id": entity_id, "operation": operation, "data": None} for entity_id in ids]
+    write_change_rows(session, rows)
+
+def write_change_rows(session, rows):
+    if not rows:
+        return
+
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        # Serial values are handed out before commit; holding the lock until commit keeps
+        # seq order equal to commit order so a reader never skips a late-committing row.
+        connection.execute(text("LOCK TABLE change_log IN EXCLUSIVE MODE"))
+    connection.execute(ChangeLog.__table__.insert(), rows)
+
+def fetch_changes(db, since, limit):
+    return (
+        db.query(ChangeLog)
+        .filter(ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit)
+        .all()
+    )
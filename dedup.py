@@ -0,0 +1,276 @@
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from sqlalchemy import select, update, delete, insert, exists, literal, func
+from models import DedupRun, DuplicateClusterProposal, DuplicateClusterMember, Author, Thesis, Keyword, SubjectTopic, Supervisor, ThesisKeyword, ThesisSupervisor, ThesisTopic
+from change_feed import record_bulk_changes
+
+# Blocks bigger than this are not scored pairwise (quadratic in the block size); their members
+# are sorted and each one is compared only with its SORTED_WINDOW nearest neighbours instead.
+MAX_BLOCK_SIZE = 200
+SORTED_WINDOW = 20
+SCAN_BATCH_SIZE = 10000
+
+DEDUP_ENTITIES = {
+    "authors": (Author, Author.author_id, (Author.first_name, Author.last_name)),
+    "supervisors": (Supervisor, Supervisor.institute_id, (Supervisor.first_name, Supervisor.last_name)),
+    "keywords": (Keyword, Keyword.keyword_id, (Keyword.keyword_name,)),
+    "subject-topics": (SubjectTopic, SubjectTopic.topic_id, (SubjectTopic.topic_name,)),
+}
+
+def normalize_name(value):
+    # "Şükrü  ÖZTÜRK" and "sukru ozturk" normalize the same; dotless ı has no decomposition
+    value = unicodedata.normalize("NFKD", (value or "").replace("ı", "i"))
+    value = "".join(ch for ch in value if not unicodedata.combining(ch)).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", value).split())
+
+def _match_key(parts):
+    # Word order carries no meaning in a keyword or topic, so reorderings are exact duplicates
+    if len(parts) == 1:
+        return " ".join(sorted(parts[0].split()))
+    return " ".join(parts)
+
+def _blocking_keys(parts):
+    if len(parts) == 2:
+        first, last = parts
+        # Either name may carry the typo, so block on each one's prefix plus the other's initial
+        return {f"l:{last[:4]}|{first[:1]}", f"f:{first[:4]}|{last[:1]}"}
+    return {f"p:{parts[0][:4]}"}
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        root = self.parent.setdefault(x, x)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while x != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+def _candidate_pairs(members, names):
+    if len(members) <= MAX_BLOCK_SIZE:
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                yield a, b
+        return
+    # Sorted neighbourhood: a typo late in the name keeps neighbours close in forward order,
+    # one early in the name keeps them close in reversed order
+    for sort_key in (lambda m: names[m][1], lambda m: names[m][1][::-1]):
+        ordered = sorted(members, key=sort_key)
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:i + 1 + SORTED_WINDOW]:
+                yield a, b
+
+def find_duplicate_clusters(db, entity, threshold=0.9):
+    model, id_column, name_columns = DEDUP_ENTITIES[entity]
+    names = {}
+    exact = {}
+    blocks = defaultdict(list)
+    clusters = _DisjointSet()
+    stats = {"rows_scanned": 0, "rows_without_name": 0, "blocks": 0, "windowed_blocks": 0, "windowed_block_rows": 0}
+
+    rows = db.query(id_column, *name_columns).order_by(id_column).yield_per(SCAN_BATCH_SIZE)
+    for entity_id, *raw in rows:
+        stats["rows_scanned"] += 1
+        parts = tuple(normalize_name(part) for part in raw)
+        # Placeholder names ("-", "", ".") normalize to nothing; matching them would cluster unrelated people
+        if not any(parts):
+            stats["rows_without_name"] += 1
+            continue
+        key = _match_key(parts)
+        names[entity_id] = (" ".join(part or "" for part in raw), " ".join(parts))
+        if key in exact:
+            clusters.union(exact[key], entity_id)
+            continue
+        exact[key] = entity_id
+        for block in _blocking_keys(parts):
+            blocks[block].append(entity_id)
+
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        stats["blocks"] += 1
+        if len(members) > MAX_BLOCK_SIZE:
+            stats["windowed_blocks"] += 1
+            stats["windowed_block_rows"] += len(members)
+        matcher = SequenceMatcher(None)
+        for a, b in _candidate_pairs(members, names):
+            if clusters.find(a) == clusters.find(b):
+                continue
+            if matcher.b != names[a][1]:
+                matcher.set_seq2(names[a][1])
+            matcher.set_seq1(names[b][1])
+            if matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold:
+                clusters.union(a, b)
+
+    grouped = defaultdict(list)
+    for entity_id in clusters.parent:
+        grouped[clusters.find(entity_id)].append(entity_id)
+    proposals = [
+        {
+            "canonical_id": root,
+            "members": [{"id": member, "name": names[member][0]} for member in sorted(members)],
+        }
+        for root, members in sorted(grouped.items())
+        if len(members) > 1
+    ]
+    return proposals, stats
+
+def run_dedup(db, entity, threshold=0.9):
+    # Batch job: replaces the entity's stored proposals with a fresh run; the caller commits
+    proposals, stats = find_duplicate_clusters(db, entity, threshold)
+    stats["clusters"] = len(proposals)
+
+    old_runs = select(DedupRun.run_id).where(DedupRun.entity == entity)
+    old_clusters = select(DuplicateClusterProposal.cluster_id).where(DuplicateClusterProposal.run_id.in_(old_runs))
+    db.execute(delete(DuplicateClusterMember).where(DuplicateClusterMember.cluster_id.in_(old_clusters)))
+    db.execute(delete(DuplicateClusterProposal).where(DuplicateClusterProposal.run_id.in_(old_runs)))
+    db.execute(delete(DedupRun).where(DedupRun.entity == entity), execution_options={"synchronize_session": "fetch"})
+
+    run = DedupRun(entity=entity, threshold=threshold, stats=stats)
+    db.add(run)
+    db.flush()
+    for start in range(0, len(proposals), SCAN_BATCH_SIZE):
+        db.add_all(
+            DuplicateClusterProposal(
+                run_id=run.run_id,
+                canonical_id=proposal["canonical_id"],
+                members=[DuplicateClusterMember(entity_id=member["id"], name=member["name"]) for member in proposal["members"]],
+            )
+            for proposal in proposals[start:start + SCAN_BATCH_SIZE]
+        )
+        db.flush()
+    return run
+
+def _drop_merged_from_proposals(db, entity, source_ids):
+    # Merged records no longer exist: remove them from stored proposals, re-point canonical ids
+    # that referred to them and drop clusters left with a single member
+    entity_clusters = (
+        select(DuplicateClusterProposal.cluster_id)
+        .join(DedupRun)
+        .where(DedupRun.entity == entity)
+    )
+    affected = [cluster_id for (cluster_id,) in db.execute(
+        select(DuplicateClusterMember.cluster_id)
+        .where(DuplicateClusterMember.entity_id.in_(source_ids), DuplicateClusterMember.cluster_id.in_(entity_clusters))
+        .distinct()
+    )]
+    if not affected:
+        return
+    db.execute(delete(DuplicateClusterMember).where(
+        DuplicateClusterMember.cluster_id.in_(affected), DuplicateClusterMember.entity_id.in_(source_ids)
+    ))
+
+    remaining = (
+        select(DuplicateClusterMember.cluster_id)
+        .where(DuplicateClusterMember.cluster_id.in_(affected))
+        .group_by(DuplicateClusterMember.cluster_id)
+        .having(func.count() > 1)
+    )
+    kept = {cluster_id for (cluster_id,) in db.execute(remaining)}
+    singletons = [cluster_id for cluster_id in affected if cluster_id not in kept]
+    db.execute(delete(DuplicateClusterMember).where(DuplicateClusterMember.cluster_id.in_(singletons)))
+    db.execute(delete(DuplicateClusterProposal).where(DuplicateClusterProposal.cluster_id.in_(singletons)))
+
+    first_member = (
+        select(func.min(DuplicateClusterMember.entity_id))
+        .where(DuplicateClusterMember.cluster_id == DuplicateClusterProposal.cluster_id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(DuplicateClusterProposal)
+        .where(DuplicateClusterProposal.cluster_id.in_(affected))
+        .values(canonical_id=first_member),
+        execution_options={"synchronize_session": False},
+    )
+
+def _merge_links(db, table, column, target_id, source_ids):
+    # Move source links to the target, skipping theses that already link to it (composite PK)
+    linked_to_target = select(table.c.thesis_no).where(column == target_id)
+    db.execute(insert(table).from_select(
+        ["thesis_no", column.key],
+        select(table.c.thesis_no, literal(target_id))
+        .where(column.in_(source_ids), table.c.thesis_no.not_in(linked_to_target))
+        .distinct(),
+    ))
+    return db.execute(delete(table).where(column.in_(source_ids))).rowcount
+
+def _merge_supervisor_links(db, target_id, source_ids):
+    table = ThesisSupervisor.__table__
+    link = table.alias("link")
+    source = table.alias("source")
+    # A thesis keeps the target as primary supervisor if any merged source was primary on it
+    source_is_primary = exists().where(
+        source.c.thesis_no == link.c.thesis_no,
+        source.c.supervisor_id.in_(source_ids),
+        source.c.is_co_supervisor.is_not(True),
+    )
+    db.execute(
+        update(table)
+        .where(table.c.supervisor_id == target_id)
+        .where(exists().where(
+            source.c.thesis_no == table.c.thesis_no,
+            source.c.supervisor_id.in_(source_ids),
+            source.c.is_co_supervisor.is_not(True),
+        ))
+        .values(is_co_supervisor=False)
+    )
+    linked_to_target = select(table.c.thesis_no).where(table.c.supervisor_id == target_id)
+    db.execute(insert(table).from_select(
+        ["thesis_no", "supervisor_id", "is_co_supervisor"],
+        select(link.c.thesis_no, literal(target_id), ~source_is_primary)
+        .where(link.c.supervisor_id.in_(source_ids), link.c.thesis_no.not_in(linked_to_target))
+        .distinct(),
+    ))
+    return db.execute(delete(table).where(table.c.supervisor_id.in_(source_ids))).rowcount
+
+def merge_entities(db, entity, target_id, source_ids):
+    model, id_column, _ = DEDUP_ENTITIES[entity]
+    thesis_nos = []
+    if entity == "authors":
+        thesis_nos = [no for (no,) in db.query(Thesis.thesis_no).filter(Thesis.author_id.in_(source_ids))]
+        rewritten = db.execute(
+            update(Thesis).where(Thesis.author_id.in_(source_ids)).values(author_id=target_id)
+        ).rowcount
+    elif entity == "supervisors":
+        rewritten = _merge_supervisor_links(db, target_id, source_ids)
+    elif entity == "keywords":
+        rewritten = _merge_links(db, ThesisKeyword.__table__, ThesisKeyword.__table__.c.keyword_id, target_id, source_ids)
+    else:
+        rewritten = _merge_links(db, ThesisTopic.__table__, ThesisTopic.__table__.c.topic_id, target_id, source_ids)
+
+    db.execute(delete(model).where(id_column.in_(source_ids)))
+    _drop_merged_from_proposals(db, entity, source_ids)
+
+    # Logging takes the change_log lock, which is held until commit. Every row lock this merge
+    # needs is taken above, so the merge never holds that lock while waiting on a writer that
+    # is itself queued for it.
+    for start in range(0, len(thesis_nos), SCAN_BATCH_SIZE):
+        chunk = thesis_nos[start:start + SCAN_BATCH_SIZE]
+        record_bulk_changes(db, Thesis, "update", objects=db.query(Thesis).filter(Thesis.thesis_no.in_(chunk)).all())
+    record_bulk_changes(db, model, "delete", ids=source_ids)
+    return rewritten
+
+if __name__ == "__main__":
+    import json
+    import sys
+    from main import SessionLocal
+
+    entity = sys.argv[1] if len(sys.argv) > 1 else "authors"
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.9
+    db = SessionLocal()
+    try:
+        run = run_dedup(db, entity, threshold)
+        db.commit()
+        json.dump({"run_id": run.run_id, "entity": entity, "threshold": threshold, "stats": run.stats}, sys.stdout, indent=2)
+        print()
+    finally:
+        db.close()
@@ -1,14 +1,21 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
-from sqlalchemy import create_engine, Column, Integer, String
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Header, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, Column, Integer, String, event, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker, Session, selectinload
 from pydantic import BaseModel
 from typing import List, Optional
-from models import Base, Author, Thesis, University, Institute, Language, Keyword, SubjectTopic, Supervisor, ThesisKeyword, ThesisSupervisor, ThesisTopic
+from models import Base, Author, Thesis, University, Institute, Language, Keyword, SubjectTopic, Supervisor, ThesisKeyword, ThesisSupervisor, ThesisTopic, ChangeLog, DedupRun, DuplicateClusterProposal
 from DTO import *
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, OperationalError
 from config import Config
 from fastapi.middleware.cors import CORSMiddleware
+from change_feed import record_changes, fetch_changes
+from search_cache import SearchCache
+from dedup import DEDUP_ENTITIES, run_dedup, merge_entities
+import asyncio
+import json
 
 app = FastAPI(title="Thesis API")
 
@@ -27,6 +34,38 @@ engine = create_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(bind=engine)
 
+event.listen(SessionLocal, "after_flush", record_changes)
+
+SEARCH_CACHE_MAX_ENTRIES = 1024
+SEARCH_CACHE_MAX_ROWS = 20000
+SEARCH_CACHE_MAX_ENTRY_ROWS = 2000
+SEARCH_CACHE_TTL_SECONDS = 60.0
+
+search_cache = SearchCache(
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_rows=SEARCH_CACHE_MAX_ROWS,
+    max_entry_rows=SEARCH_CACHE_MAX_ENTRY_ROWS,
+    ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+)
+event.listen(SessionLocal, "after_flush", search_cache.mark_dirty)
+event.listen(SessionLocal, "after_commit", search_cache.after_commit)
+event.listen(SessionLocal, "after_rollback", search_cache.after_rollback)
+
+CHANGE_STREAM_POLL_SECONDS = 1.0
+CHANGE_STREAM_HEARTBEAT_SECONDS = 15.0
+
+BOOTSTRAP_VERSION = 1
+BOOTSTRAP_COLLECTIONS = {
+    "universities": (University, University.university_id),
+    "institutes": (Institute, Institute.institute_id),
+    "languages": (Language, Language.language_id),
+    "keywords": (Keyword, Keyword.keyword_id),
+    "subject_topics": (SubjectTopic, SubjectTopic.topic_id),
+    "authors": (Author, Author.author_id),
+    "supervisors": (Supervisor, Supervisor.institute_id),
+    "theses": (Thesis, Thesis.thesis_no),
+}
+
 def get_db():
     db = SessionLocal()
     try:
@@ -52,6 +91,18 @@ def search_theses(
     institute: Optional[str] = Query(None, description="Search by institute name"),
     db: Session = Depends(get_db),
 ):
+    # Empty filters are skipped by the query, so they share a cache key with missing ones
+    filters = tuple(value or None for value in (
+        thesis_no, title, author_name, keyword, topic, year, type, language, university, institute,
+    ))
+    results = search_cache.get_or_load(filters, lambda: _run_thesis_search(db, *filters))
+
+    if not results:
+        raise HTTPException(status_code=404, detail="No theses found matching the criteria")
+
+    return results
+
+def _run_thesis_search(db, thesis_no, title, author_name, keyword, topic, year, type, language, university, institute):
     query = db.query(Thesis).join(Author).join(Language).join(Institute).join(University)
     query = query.outerjoin(Thesis.keywords).outerjoin(Thesis.topics)
 
@@ -78,12 +129,8 @@ def search_theses(
     if thesis_no:
         query = query.filter(Thesis.thesis_no == thesis_no)
 
-    results = query.order_by(Thesis.thesis_no).all()
-
-    if not results:
-        raise HTTPException(status_code=404, detail="No theses found matching the criteria")
-
-    return results
+    # Cached results outlive the session, so detach them from the ORM objects here
+    return [ThesisResponseWithRelations.model_validate(thesis) for thesis in query.order_by(Thesis.thesis_no).all()]
 
 
 @app.put("/update_thesis/{thesis_no}")
@@ -95,26 +142,12 @@ def update_thesis(thesis_no: int, thesis: ThesisUpdate, db: Session = Depends(ge
     try:
         update_data = thesis.dict(exclude_unset=True)
         
-        if 'author' in update_data:
-            author_data = update_data.pop('author')
-            db.query(Author).filter(
-                Author.author_id == db_thesis.author_id
-            ).update(author_data)
-        if 'language' in update_data:
-            language_data = update_data.pop('language')
-            db.query(Language).filter(
-                Language.language_id == db_thesis.language_id
-            ).update(language_data)
-        if 'university' in update_data:
-            university_data = update_data.pop('university')
-            db.query(University).filter(
-                University.university_id == db_thesis.university_id
-            ).update(university_data)
-        if 'institute' in update_data:
-            institute_data = update_data.pop('institute')
-            db.query(Institute).filter(
-                Institute.institute_id == db_thesis.institute_id
-            ).update(institute_data)
+        # Related rows are updated through the ORM (not query.update) so the change feed sees them
+        for relation in ('author', 'language', 'university', 'institute'):
+            if relation in update_data:
+                related = getattr(db_thesis, relation)
+                for key, value in update_data.pop(relation).items():
+                    setattr(related, key, value)
             
         for key, value in update_data.items():
             if value is not None:
@@ -388,6 +421,168 @@ def update_supervisor(supervisor_id: int, supervisor: SupervisorBase, db: Sessio
     db.refresh(db_supervisor)
     return db_supervisor
 
+# --- Bootstrap Endpoint'i ---
+@app.get("/bootstrap/", response_model=BootstrapResponse, response_model_exclude_unset=True)
+def bootstrap(
+    collections: Optional[str] = Query(None, description="Comma-separated collections to include (default: all)"),
+    db: Session = Depends(get_db),
+):
+    if collections:
+        names = [name.strip().replace("-", "_") for name in collections.split(",") if name.strip()]
+        unknown = [name for name in names if name not in BOOTSTRAP_COLLECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+    else:
+        names = list(BOOTSTRAP_COLLECTIONS)
+
+    # One connection and one snapshot for every collection, so the payload and last_seq agree
+    if db.bind.dialect.name == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    payload = {
+        "version": BOOTSTRAP_VERSION,
+        "last_seq": db.query(func.coalesce(func.max(ChangeLog.seq), 0)).scalar(),
+    }
+    for name in names:
+        model, order_column = BOOTSTRAP_COLLECTIONS[name]
+        payload[name] = db.query(model).order_by(order_column).all()
+    return payload
+
+# --- Tekilleştirme Endpoint'leri ---
+def _run_dedup_job(entity, threshold):
+    db = SessionLocal()
+    try:
+        run_dedup(db, entity, threshold)
+        db.commit()
+    finally:
+        db.close()
+
+@app.post("/dedup/{entity}/runs", status_code=202)
+def start_dedup_run(
+    entity: str,
+    background_tasks: BackgroundTasks,
+    threshold: float = Query(0.9, ge=0.5, le=1.0, description="Minimum name similarity for two records to be clustered"),
+):
+    if entity not in DEDUP_ENTITIES:
+        raise HTTPException(status_code=404, detail="Unknown entity")
+    # Scanning a large table takes minutes; large imports should run `python dedup.py <entity>` instead
+    background_tasks.add_task(_run_dedup_job, entity, threshold)
+    return {"message": "Deduplication run started"}
+
+@app.get("/dedup/{entity}/clusters", response_model=DuplicateClusterPage)
+def list_duplicate_clusters(
+    entity: str,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of clusters to return"),
+    offset: int = Query(0, ge=0, description="Number of clusters to skip"),
+    db: Session = Depends(get_db),
+):
+    if entity not in DEDUP_ENTITIES:
+        raise HTTPException(status_code=404, detail="Unknown entity")
+    run = db.query(DedupRun).filter(DedupRun.entity == entity).order_by(DedupRun.run_id.desc()).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="No deduplication run found for this entity")
+
+    # Merges prune stored proposals, so count what is left rather than trusting the run's stats
+    query = db.query(DuplicateClusterProposal).filter(DuplicateClusterProposal.run_id == run.run_id)
+    clusters = (
+        query.options(selectinload(DuplicateClusterProposal.members))
+        .order_by(DuplicateClusterProposal.canonical_id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return {
+        "run_id": run.run_id,
+        "threshold": run.threshold,
+        "created_at": run.created_at,
+        "stats": run.stats,
+        "total": query.count(),
+        "clusters": [
+            {
+                "canonical_id": cluster.canonical_id,
+                "members": [{"id": member.entity_id, "name": member.name} for member in cluster.members],
+            }
+            for cluster in clusters
+        ],
+    }
+
+@app.post("/dedup/{entity}/merge", response_model=MergeResponse)
+def merge_duplicates(entity: str, merge: MergeRequest, db: Session = Depends(get_db)):
+    if entity not in DEDUP_ENTITIES:
+        raise HTTPException(status_code=404, detail="Unknown entity")
+    source_ids = sorted(set(merge.source_ids) - {merge.target_id})
+    if not source_ids:
+        raise HTTPException(status_code=400, detail="No source records to merge")
+
+    _, id_column, _ = DEDUP_ENTITIES[entity]
+    found = {entity_id for (entity_id,) in db.query(id_column).filter(id_column.in_([merge.target_id, *source_ids]))}
+    missing = sorted({merge.target_id, *source_ids} - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Records not found: {', '.join(map(str, missing))}")
+
+    try:
+        rewritten = merge_entities(db, entity, merge.target_id, source_ids)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except OperationalError as e:
+        # Deadlock or lock timeout against concurrent writers; nothing was applied, so the merge can be retried
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    # Bulk statements bypass the session hooks, so drop cached searches explicitly
+    search_cache.invalidate()
+    return {"target_id": merge.target_id, "merged_ids": source_ids, "references_rewritten": rewritten}
+
+# --- Change Feed Endpoint'leri ---
+@app.get("/changes/", response_model=ChangeFeedResponse)
+def list_changes(
+    since: int = Query(0, ge=0, description="Return changes with a sequence number greater than this"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of changes to return"),
+    db: Session = Depends(get_db),
+):
+    changes = fetch_changes(db, since, limit)
+    last_seq = changes[-1].seq if changes else since
+    return {"changes": changes, "last_seq": last_seq}
+
+def _read_changes(since):
+    db = SessionLocal()
+    try:
+        return [ChangeResponse.model_validate(change) for change in fetch_changes(db, since, 500)]
+    finally:
+        db.close()
+
+@app.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Stream changes with a sequence number greater than this"),
+    last_event_id: Optional[int] = Header(None),
+):
+    # Reconnecting EventSource clients send Last-Event-ID, which takes precedence over ?since=
+    cursor = last_event_id if last_event_id is not None else since
+
+    async def event_source():
+        nonlocal cursor
+        idle = 0.0
+        while not await request.is_disconnected():
+            changes = await run_in_threadpool(_read_changes, cursor)
+            for change in changes:
+                cursor = change.seq
+                yield f"id: {change.seq}\nevent: change\ndata: {json.dumps(change.model_dump(mode='json'))}\n\n"
+            if changes:
+                idle = 0.0
+                continue
+            if idle >= CHANGE_STREAM_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(CHANGE_STREAM_POLL_SECONDS)
+            idle += CHANGE_STREAM_POLL_SECONDS
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 def init_db():
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Text, Boolean, CheckConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Float, Text, Boolean, CheckConstraint, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from datetime import datetime
 
 Base = declarative_base()
 
@@ -113,4 +114,44 @@ class ThesisTopic(Base):
     __tablename__ = 'thesis_topic'
     
     thesis_no = Column(Integer, ForeignKey('thesis.thesis_no', onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
-    topic_id = Column(Integer, ForeignKey('subject_topic.topic_id', onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
\ No newline at end of file
+    topic_id = Column(Integer, ForeignKey('subject_topic.topic_id', onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+
+class ChangeLog(Base):
+    __tablename__ = 'change_log'
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(50), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)
+    data = Column(JSON)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class DedupRun(Base):
+    __tablename__ = 'dedup_run'
+    
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(50), nullable=False)
+    threshold = Column(Float, nullable=False)
+    stats = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    clusters = relationship("DuplicateClusterProposal", back_populates="run", cascade="all, delete")
+
+class DuplicateClusterProposal(Base):
+    __tablename__ = 'duplicate_cluster'
+    
+    cluster_id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(Integer, ForeignKey('dedup_run.run_id', ondelete="CASCADE"), nullable=False)
+    canonical_id = Column(Integer, nullable=False)
+    
+    run = relationship("DedupRun", back_populates="clusters")
+    members = relationship("DuplicateClusterMember", back_populates="cluster", cascade="all, delete", order_by="DuplicateClusterMember.entity_id")
+
+class DuplicateClusterMember(Base):
+    __tablename__ = 'duplicate_cluster_member'
+    
+    cluster_id = Column(Integer, ForeignKey('duplicate_cluster.cluster_id', ondelete="CASCADE"), primary_key=True)
+    entity_id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False)
+    
+    cluster = relationship("DuplicateClusterProposal", back_populates="members")
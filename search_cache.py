@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SearchCache:
+    # LRU + TTL result cache; concurrent misses for the same key share one load (single-flight).
+    # Entries are weighted by their row count: the cache holds at most max_rows rows in total,
+    # and a result larger than max_entry_rows is returned to its callers but never stored.
+
+    def __init__(self, max_entries=1024, max_rows=20000, max_entry_rows=2000, ttl_seconds=60.0):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.max_entry_rows = max_entry_rows
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return value
+                self._evict(key)
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+                generation = self._generation
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self._lock:
+                # A write committed while loading makes this result stale; hand it out but don't keep it
+                if generation == self._generation and len(call.value) <= self.max_entry_rows:
+                    if key in self._entries:
+                        self._evict(key)
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, call.value)
+                    self._rows += len(call.value)
+                    while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                        self._evict(next(iter(self._entries)))
+            return call.value
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is call:
+                    del self._inflight[key]
+            call.done.set()
+
+    def _evict(self, key):
+        _, value = self._entries.pop(key)
+        self._rows -= len(value)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._rows = 0
+            # Requests arriving from now on must not join loads that started before the write
+            self._inflight.clear()
+
+    # Session hooks: remember that a flush wrote rows, drop the cache only once the write is committed
+    def mark_dirty(self, session, flush_context):
+        if session.new or session.dirty or session.deleted:
+            session.info["search_cache_dirty"] = True
+
+    def after_commit(self, session):
+        if session.info.pop("search_cache_dirty", False):
+            self.invalidate()
+
+    def after_rollback(self, session):
+        session.info.pop("search_cache_dirty", None)